@@ -6,12 +6,57 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import os
 import sys
+import re
 import abc
+import atexit
+import time
+import logging
+import threading
+from collections import namedtuple
+from itertools import groupby
 
 
 __all__ = ["SQLDB", "SQLRecord", "build_sql_query"]
 
 
+## Optional leading keywords in clauses passed to :func:`build_sql_query`
+_WHERE_RE = re.compile(r'^\s*WHERE\b\s*', re.IGNORECASE)
+_GROUP_RE = re.compile(r'^\s*GROUP\s+BY\b\s*', re.IGNORECASE)
+_HAVING_RE = re.compile(r'^\s*HAVING\b\s*', re.IGNORECASE)
+_ORDER_RE = re.compile(r'^\s*ORDER\s+BY\b\s*', re.IGNORECASE)
+
+_logger = logging.getLogger(__name__)
+
+## Memoized queries built by :func:`build_sql_query`
+_SQL_QUERY_CACHE = {}
+_SQL_QUERY_CACHE_SIZE = 512
+
+
+def _has_module(module_name):
+	"""
+	Check if a (top-level) module is available without importing it
+
+	:param module_name:
+		str, name of module
+
+	:return:
+		bool
+	"""
+	try:
+		from importlib.util import find_spec
+	except ImportError:
+		## Python 2
+		import imp
+		try:
+			imp.find_module(module_name)
+		except ImportError:
+			return False
+		else:
+			return True
+	else:
+		return find_spec(module_name) is not None
+
+
 def build_sql_query(
 	table_clause,
 	column_clause="*",
@@ -32,12 +77,12 @@ def build_sql_query(
 		join clause
 		(default: "")
 	:param where_clause:
-		str or list, where clause
-		If list, different items will be connected using AND operator
+		str or list/tuple, where clause
+		If list or tuple, different items will be connected using AND operator
 		(default: "")
 	:param having_clause:
-		str or list, having clause
-		If list, different items will be connected using AND operator
+		str or list/tuple, having clause
+		If list or tuple, different items will be connected using AND operator
 		(default: "")
 	:param order_clause:
 		str, order clause
@@ -49,41 +94,300 @@ def build_sql_query(
 	:return:
 		str, SQL query
 	"""
+	## Fast path for the most common query: all columns of a single table
+	if (column_clause == "*" and not isinstance(table_clause, (list, tuple))
+		and not (join_clause or where_clause or having_clause or order_clause
+				or group_clause)):
+		return 'SELECT * FROM ' + table_clause
+
+	clauses = (table_clause, column_clause, join_clause, where_clause,
+				having_clause, order_clause, group_clause)
+	## Lists are converted to tuples so they can be used as dict key
+	cache_key = _freeze_clause(clauses)
+	try:
+		return _SQL_QUERY_CACHE[cache_key]
+	except KeyError:
+		pass
+	except TypeError:
+		## Unhashable clause, don't cache
+		return _build_sql_query(*clauses)
+
+	query = _build_sql_query(*clauses)
+	if len(_SQL_QUERY_CACHE) >= _SQL_QUERY_CACHE_SIZE:
+		_SQL_QUERY_CACHE.clear()
+	_SQL_QUERY_CACHE[cache_key] = query
+	return query
+
+build_sql_query.cache_clear = _SQL_QUERY_CACHE.clear
+
+
+def _freeze_clause(clause):
+	"""
+	Recursively convert lists in query clause to tuples
+	"""
+	if isinstance(clause, (list, tuple)):
+		return tuple(_freeze_clause(item) for item in clause)
+	else:
+		return clause
+
+
+def _build_sql_query(
+	table_clause,
+	column_clause,
+	join_clause,
+	where_clause,
+	having_clause,
+	order_clause,
+	group_clause):
+	"""
+	Uncached implementation of :func:`build_sql_query`
+	"""
 	if isinstance(table_clause, (list, tuple)):
 		table_clause = ', '.join(table_clause)
 	if isinstance(column_clause, (list, tuple)):
 		column_clause = ', '.join(column_clause)
-	query = 'SELECT %s FROM %s' % (column_clause, table_clause)
+
+	## Collect query parts and join them only once at the end
+	parts = ['SELECT ', column_clause, ' FROM ', table_clause]
+	_append = parts.append
 	if join_clause:
 		if isinstance(join_clause, (list, tuple)):
 			for (join_type, join_table, condition) in join_clause:
 				if not join_type.split()[-1] == "JOIN":
 					join_type += ' JOIN'
-				query += ' %s %s ON %s' % (join_type.upper(), join_table, condition)
+				_append(' %s %s ON %s' % (join_type.upper(), join_table, condition))
 		else:
-			query += ' %s' % join_clause
+			_append(' ')
+			_append(join_clause)
 	if where_clause:
-		if isinstance(where_clause, list):
+		if isinstance(where_clause, (list, tuple)):
 			where_clause = ' AND '.join(where_clause)
-		if where_clause.lstrip()[:5].upper() == "WHERE":
-			where_clause = where_clause.lstrip()[5:]
-		query += ' WHERE %s' % where_clause
+		_append(' WHERE ')
+		_append(_WHERE_RE.sub('', where_clause, count=1))
 	if group_clause:
-		if group_clause.lstrip()[:8].upper() == "GROUP BY":
-			group_clause = group_clause.lstrip()[8:]
-		query += ' GROUP BY %s' % group_clause
+		_append(' GROUP BY ')
+		_append(_GROUP_RE.sub('', group_clause, count=1))
 	if having_clause:
-		if isinstance(having_clause, list):
+		if isinstance(having_clause, (list, tuple)):
 			having_clause = ' AND '.join(having_clause)
-		if having_clause.lstrip()[:6].upper() == "HAVING":
-			having_clause = having_clause.lstrip()[6:]
-		query += ' HAVING %s' % having_clause
+		_append(' HAVING ')
+		_append(_HAVING_RE.sub('', having_clause, count=1))
 	if order_clause:
-		if order_clause.lstrip()[:8].upper() == "ORDER BY":
-			order_clause = order_clause.lstrip()[8:]
-		query += ' ORDER BY %s' % order_clause
+		_append(' ORDER BY ')
+		_append(_ORDER_RE.sub('', order_clause, count=1))
 
-	return query
+	return ''.join(parts)
+
+
+def _log_query(query, verbose=False, errf=None):
+	"""
+	Report SQL query before it is executed: write it to a file,
+	print it, or else log it at DEBUG level (if enabled)
+
+	:param query:
+		str, SQL query
+	:param verbose:
+		bool, whether or not to print the query
+		(default: False)
+	:param errf:
+		file object, where to write the query (takes precedence
+		over :param:`verbose`)
+		(default: None)
+	"""
+	if errf is not None:
+		errf.write("%s\n" % query)
+		errf.flush()
+	elif verbose:
+		print(query)
+	elif _logger.isEnabledFor(logging.DEBUG):
+		_logger.debug('%s', query)
+
+
+## Namedtuple classes created by :func:`_get_row_class`, keyed by fields
+_row_classes = {}
+_ROW_CLASSES_SIZE = 256
+
+
+def _get_row_class(fields):
+	"""
+	Get namedtuple class for records with given fields,
+	reusing the class created for an earlier query if possible
+
+	:param fields:
+		list of strings, column names (invalid or duplicate names
+		are replaced with positional names, e.g. '_1')
+
+	:return:
+		namedtuple class
+	"""
+	fields = tuple(fields)
+	Row = _row_classes.get(fields)
+	if Row is None:
+		Row = namedtuple('Row', fields, rename=True)
+		if len(_row_classes) >= _ROW_CLASSES_SIZE:
+			_row_classes.clear()
+		_row_classes[fields] = Row
+	return Row
+
+
+def _is_closed(conn):
+	"""
+	Determine whether database connection is known to be closed,
+	without contacting the server
+
+	:param conn:
+		database connection
+
+	:return:
+		bool
+	"""
+	## psycopg2 has a 'closed' attribute, MySQLdb/pymysql an 'open' attribute
+	return bool(getattr(conn, 'closed', False)) or not getattr(conn, 'open', True)
+
+
+def _check_connection(conn):
+	"""
+	Check that database connection is still usable, by running
+	a trivial query
+
+	:param conn:
+		database connection
+
+	:raise:
+		Exception if the connection is closed or broken
+	"""
+	cursor = conn.cursor()
+	try:
+		cursor.execute('SELECT 1')
+		cursor.fetchall()
+	finally:
+		cursor.close()
+
+
+class _ConnectionPool(object):
+	"""
+	Minimal thread-safe pool of reusable database connections.
+
+	:param creator:
+		callable without arguments, returning a new database connection
+	:param maxcached:
+		int, maximum number of idle connections kept in the pool
+		(default: 5)
+	:param check:
+		callable taking a connection as argument, raising an exception
+		if the connection is no longer usable
+		(default: None, will use :func:`_check_connection`)
+	:param check_idle_time:
+		float, number of seconds a connection must have been idle
+		before it is checked with :param:`check` on checkout
+		(default: 60.)
+	"""
+	def __init__(self, creator, maxcached=5, check=None, check_idle_time=60.):
+		self.creator = creator
+		self.maxcached = maxcached
+		self.check = check or _check_connection
+		self.check_idle_time = check_idle_time
+		## (connection, time returned to pool) tuples
+		self._idle = []
+		self._lock = threading.Lock()
+
+	def getconn(self):
+		"""
+		Take idle connection from the pool, or open a new one if
+		there is none. Connections known to be closed are discarded.
+		Connections that have been idle for a while are checked first
+		(costing a round trip), as the server may have closed them in
+		the mean time (e.g., after a timeout or restart).
+
+		:return:
+			database connection
+		"""
+		while True:
+			with self._lock:
+				if not self._idle:
+					break
+				conn, idle_since = self._idle.pop()
+			if _is_closed(conn):
+				self._close(conn)
+				continue
+			if time.time() - idle_since > self.check_idle_time:
+				try:
+					self.check(conn)
+				except Exception:
+					self._close(conn)
+					continue
+			return conn
+		return self.creator()
+
+	def putconn(self, conn):
+		"""
+		Return connection to the pool. Any pending transaction is
+		rolled back. Broken connections, and connections exceeding
+		:prop:`maxcached` are closed.
+
+		:param conn:
+			database connection obtained with :meth:`getconn`
+		"""
+		try:
+			conn.rollback()
+		except Exception:
+			self._close(conn)
+			return
+		with self._lock:
+			if len(self._idle) < self.maxcached:
+				self._idle.append((conn, time.time()))
+				return
+		self._close(conn)
+
+	def closeall(self):
+		"""
+		Close all idle connections
+		"""
+		with self._lock:
+			idle, self._idle = self._idle, []
+		for conn, _ in idle:
+			self._close(conn)
+
+	@staticmethod
+	def _close(conn):
+		try:
+			conn.close()
+		except Exception:
+			pass
+
+
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+
+def _get_connection_pool(key, creator, check=None):
+	"""
+	Get connection pool for particular connection parameters,
+	creating it if necessary
+
+	:param key:
+		hashable, uniquely identifying the connection parameters
+	:param creator:
+		callable without arguments, returning a new database connection
+	:param check:
+		callable checking that an idle connection is still usable,
+		see :class:`_ConnectionPool`
+		(default: None)
+
+	:return:
+		instance of :class:`_ConnectionPool`
+	"""
+	with _connection_pools_lock:
+		pool = _connection_pools.get(key)
+		if pool is None:
+			pool = _connection_pools[key] = _ConnectionPool(creator, check=check)
+	return pool
+
+
+@atexit.register
+def _close_connection_pools():
+	for pool in list(_connection_pools.values()):
+		pool.closeall()
 
 
 class SQLRecord(object):
@@ -95,6 +399,9 @@ class SQLRecord(object):
 	:param db:
 		instance of :class:`SQLDB`
 	"""
+	## One instance is created for each record, so avoid per-instance __dict__
+	__slots__ = ('_sql_rec', 'db')
+
 	def __init__(self, sql_rec, db):
 		self._sql_rec = sql_rec
 		self.db = db
@@ -105,25 +412,37 @@ class SQLRecord(object):
 		return self._sql_rec.__getitem__(str(name))
 
 	def __getattr__(self, name):
-		return self.__getitem__(name)
+		## Only called if normal attribute lookup fails. Don't look up
+		## special names in the record (e.g., when copying or pickling)
+		if name.startswith('__') or name == '_sql_rec':
+			raise AttributeError(name)
+		try:
+			return self.__getitem__(name)
+		except (KeyError, IndexError):
+			raise AttributeError(name)
 
 	def get(self, name, default_value):
-		if name in self._sql_rec:
+		## Note: 'name in sqlite3.Row' tests values rather than keys
+		try:
 			return self.__getitem__(name)
-		else:
+		except (KeyError, IndexError):
 			return default_value
 
 	def keys(self):
 		return self._sql_rec.keys()
 
 	def values(self):
-		return [self._sql_rec[key] for key in self.keys()]
+		if isinstance(self._sql_rec, dict):
+			return list(self._sql_rec.values())
+		else:
+			## sqlite3.Row and psycopg2 DictRow iterate over values
+			return list(self._sql_rec)
 
 	def items(self):
-		return [(key, val) for key, val in zip(self.keys(), self.values())]
+		return list(zip(self.keys(), self.values()))
 
 	def to_dict(self):
-		return {key:val for key,val in self.items()}
+		return dict(zip(self.keys(), self.values()))
 
 	def update(self, table_name):
 		pass
@@ -141,6 +460,9 @@ class SQLDB(object):
 	connection = None
 	verbose = False
 	_placeholder = '%s'
+	_insert_sql_cache = None
+	## Whether CREATE INDEX supports IF NOT EXISTS
+	_index_if_not_exists = True
 
 	@abc.abstractmethod
 	def connect(self):
@@ -153,19 +475,51 @@ class SQLDB(object):
 	def get_cursor(self):
 		return self.connection.cursor()
 
+	def _get_read_cursor(self):
+		"""
+		Get cursor for read-only queries issued by :meth:`query`.
+		Subclasses may override this to use a separate connection.
+		"""
+		return self.get_cursor()
+
 	def __del__(self):
 		self.close()
 
-	def _gen_sql_records(self, cursor):
-		for row in cursor.fetchall():
-			yield SQLRecord(row, self)
+	def _executemany(self, sql, seq_of_values):
+		"""
+		Execute SQL statement for each item in a sequence of values
+
+		:param sql:
+			str, SQL statement with placeholders
+		:param seq_of_values:
+			sequence of tuples or dicts, values to substitute
+		"""
+		cursor = self.get_cursor()
+		cursor.executemany(sql, seq_of_values)
+
+	def _gen_sql_records(self, cursor, raw=False, batch_size=1000):
+		## Fetch rows in batches rather than with fetchall() to avoid
+		## loading the entire result set in memory
+		while True:
+			rows = cursor.fetchmany(batch_size)
+			if not rows:
+				break
+			if raw:
+				for row in rows:
+					yield row
+			else:
+				for row in rows:
+					yield SQLRecord(row, self)
 
 	def query_generic(self,
 		query,
 		values=(),
 		verbose=False,
 		print_table=False,
-		errf=None):
+		errf=None,
+		raw=False,
+		batch_size=1000,
+		cursor=None):
 		"""
 		Generic query of one or more database tables.
 
@@ -183,31 +537,51 @@ class SQLDB(object):
 			(default: False)
 		:param errf:
 			file object, where to print errors (default: None)
+		:param raw:
+			bool, whether to yield the rows returned by the database
+			driver (e.g., sqlite3.Row) instead of wrapping them in
+			:class:`SQLRecord`. These support access by column name,
+			but not as attribute.
+			(default: False)
+		:param batch_size:
+			int, number of records to fetch from the cursor at once,
+			trading memory for number of round trips
+			(default: 1000)
+		:param cursor:
+			database cursor to execute the query with
+			(default: None, will obtain a new cursor with :meth:`get_cursor`)
 
 		:return:
 			generator object, yielding an instance of :class:`SQLRecord`
-			for each record
-			or None if :param:`print_table` is True
+			(or a raw row) for each record
+			or None if :param:`print_table` is True.
+			Records are read from the cursor while iterating (not fetched
+			all at once), so the result reflects changes made to the
+			queried table(s) on the same connection in the mean time.
+			Read all records first (e.g., with list()) if they are to be
+			updated during iteration, otherwise updated records may be
+			returned again.
 		"""
-		if errf != None:
-			errf.write("%s\n" % query)
-			errf.flush()
-		elif verbose or self.verbose:
-			print(query)
+		_log_query(query, verbose or self.verbose, errf)
 
-		cursor = self.get_cursor()
-		cursor.execute(query, values)
+		if cursor is None:
+			cursor = self.get_cursor()
+		if values:
+			cursor.execute(query, values)
+		else:
+			## Avoid parameter substitution (e.g., of literal % signs)
+			cursor.execute(query)
 
 		if print_table:
 			import prettytable as pt
 			## Ensure order of columns is preserved in table
 			col_names = list(map(lambda x:x[0], cursor.description))
 			tab = pt.PrettyTable(col_names)
-			for r, rec in enumerate(self._gen_sql_records(cursor)):
+			for rec in self._gen_sql_records(cursor, raw=True):
 				tab.add_row([rec[col_name] for col_name in col_names])
 			print(tab)
 		else:
-			return self._gen_sql_records(cursor)
+			return self._gen_sql_records(cursor, raw=raw, batch_size=batch_size)
 
 	def query(self,
 		table_clause,
@@ -219,7 +593,10 @@ class SQLDB(object):
 		group_clause="",
 		verbose=False,
 		print_table=False,
-		errf=None):
+		errf=None,
+		raw=False,
+		values=(),
+		batch_size=1000):
 		"""
 		Query one or more database tables using separate clauses.
 
@@ -242,17 +619,32 @@ class SQLDB(object):
 		:param verbose:
 		:param print_table:
 		:param errf:
+		:param raw:
+		:param batch_size:
 			see :meth:`query_generic`
+		:param values:
+			tuple or dict, values or named parameters to be substituted
+			for placeholders in the clauses. Binding values rather than
+			formatting them in the clauses keeps the query text constant,
+			so the database can reuse the prepared statement.
+			(default: ())
 
 		:return:
 			generator object, yielding an instance of :class:`SQLRecord`
-			for each record
+			(or a raw row) for each record.
+			Records are read from the cursor while iterating (not fetched
+			all at once), so the result reflects changes made to the
+			queried table(s) on the same connection in the mean time.
+			Read all records first (e.g., with list()) if they are to be
+			updated during iteration, otherwise updated records may be
+			returned again.
 		"""
 		query = build_sql_query(table_clause, column_clause, join_clause,
 								where_clause, having_clause, order_clause,
 								group_clause)
-		return self.query_generic(query, verbose=verbose,
-								print_table=print_table,errf=errf)
+		return self.query_generic(query, values=values, verbose=verbose,
+								print_table=print_table, errf=errf, raw=raw,
+								batch_size=batch_size, cursor=self._get_read_cursor())
 
 	def get_num_rows(self, table_name):
 		"""
@@ -330,8 +722,8 @@ class SQLDB(object):
 			are supported.
 			Note that only col_name and col_type are required.
 		"""
-		sql = 'CREATE TABLE %s(' % table_name
-		for i, column_info in enumerate(column_info_list):
+		col_defs = []
+		for column_info in column_info_list:
 			if isinstance(column_info, (list, tuple)):
 				colname, coltype, notnull, default_value, primary_key = column_info
 			else:
@@ -340,16 +732,15 @@ class SQLDB(object):
 				notnull = column_info.get('notnull', 0)
 				default_value = column_info.get('default_value')
 				primary_key = column_info.get('primary_key', 0)
-			if i != 0:
-				sql += ', '
-			sql += '%s %s' % (colname, coltype)
+			col_def = '%s %s' % (colname, coltype)
 			if default_value:
-				sql += ' default %s' % default_value
+				col_def += ' default %s' % default_value
 			if notnull:
-				sql += ' NOT NULL'
+				col_def += ' NOT NULL'
 			if primary_key:
-				sql += ' PRIMARY KEY'
-		sql += ')'
+				col_def += ' PRIMARY KEY'
+			col_defs.append(col_def)
+		sql = 'CREATE TABLE %s(%s)' % (table_name, ', '.join(col_defs))
 		self.query_generic(sql)
 		self.connection.commit()
 
@@ -407,13 +798,41 @@ class SQLDB(object):
 		self.query_generic(sql)
 		self.connection.commit()
 
+	def _get_insert_sql(self, table_name, col_names):
+		"""
+		Get INSERT statement for particular table and columns.
+		Statements are cached, so repeated inserts use the same SQL
+		text and can reuse the driver's prepared statement.
+
+		:param table_name:
+			str, table name
+		:param col_names:
+			tuple of strings, column names
+
+		:return:
+			str, SQL statement with placeholders
+		"""
+		if self._insert_sql_cache is None:
+			self._insert_sql_cache = {}
+		key = (table_name, col_names)
+		sql = self._insert_sql_cache.get(key)
+		if sql is None:
+			sql = "INSERT INTO %s (%s) VALUES (%s)"
+			sql %= (table_name, ", ".join(col_names), ', '.join([self._placeholder]*len(col_names)))
+			self._insert_sql_cache[key] = sql
+		return sql
+
 	def add_records(self,
 		table_name,
 		recs,
-		dry_run=False):
+		dry_run=False,
+		commit=True):
 		"""
 		Add records to database table.
 
+		Consecutive records with the same columns are inserted with
+		a single executemany call, all in one transaction.
+
 		:param table_name:
 			str, table name
 		:param recs:
@@ -421,18 +840,22 @@ class SQLDB(object):
 		:param dry_run:
 			bool, whether or not to dry run the operation
 			(default: False)
+		:param commit:
+			bool, whether or not to commit the transaction. Set to False
+			to combine several operations in one transaction, which
+			must then be committed by the caller
+			(default: True)
 		"""
-		cursor = self.get_cursor()
-		for rec in recs:
-			sql = "INSERT INTO %s (%s) VALUES (%s)"
-			sql %= (table_name, ", ".join(rec.keys()), ', '.join([self._placeholder]*len(rec)))
-			if self.verbose:
-				print(sql)
-			cursor.execute(sql, rec.values())
+		## Note: grouping only consecutive records preserves insertion order
+		for col_names, rec_group in groupby(recs, key=lambda rec: tuple(sorted(rec.keys()))):
+			sql = self._get_insert_sql(table_name, col_names)
+			_log_query(sql, self.verbose)
+			self._executemany(sql, [tuple(rec[col_name] for col_name in col_names)
+									for rec in rec_group])
 
 		if dry_run:
 			self.connection.rollback()
-		else:
+		elif commit:
 			self.connection.commit()
 
 	def delete_records(self,
@@ -452,8 +875,7 @@ class SQLDB(object):
 			(default: False)
 		"""
 		sql = 'DELETE FROM %s' % table_name
-		if where_clause.lstrip()[:5].upper() == "WHERE":
-			where_clause = where_clause.lstrip()[5:]
+		where_clause = _WHERE_RE.sub('', where_clause, count=1)
 		if where_clause:
 			sql += ' WHERE %s' % where_clause
 		self.query_generic(sql)
@@ -485,12 +907,11 @@ class SQLDB(object):
 		sql = 'UPDATE %s SET ' % table_name
 		sql += ', '.join(['%s = %s' % (key, self._placeholder) for key in col_dict.keys()])
 
-		if where_clause.lstrip()[:5].upper() == "WHERE":
-			where_clause = where_clause.lstrip()[5:]
+		where_clause = _WHERE_RE.sub('', where_clause, count=1)
 		if where_clause:
 			sql += ' WHERE %s' % where_clause
 
-		cursor.execute(sql, col_dict.values())
+		cursor.execute(sql, list(col_dict.values()))
 
 		if dry_run:
 			self.connection.rollback()
@@ -593,19 +1014,28 @@ class SQLDB(object):
 		col_name,
 		idx_name=None):
 		"""
-		Create index on particular column of a database table.
+		Create index on particular column of a database table,
+		unless an index with the same name already exists.
 
 		:param table_name:
 			string, name of database table
 		:param col_name:
-			string, name of column
+			string, name of column, or list of strings, names of columns
+			for a composite index
 		:param idx_name:
 			string, name of index
-			(default: None)
+			(default: None, will be derived from column name(s))
 		"""
+		if isinstance(col_name, (list, tuple)):
+			col_names = list(col_name)
+		else:
+			col_names = [col_name]
 		if not idx_name:
-			idx_name = "%s_IDX" % col_name
-		sql = "CREATE INDEX %s ON %s(%s)"
-		sql %= (idx_name, table_name, col_name)
+			idx_name = "%s_IDX" % '_'.join(col_names)
+		if self._index_if_not_exists:
+			sql = "CREATE INDEX IF NOT EXISTS %s ON %s(%s)"
+		else:
+			sql = "CREATE INDEX %s ON %s(%s)"
+		sql %= (idx_name, table_name, ', '.join(col_names))
 		self.query_generic(sql)
 		self.connection.commit()
@@ -7,31 +7,76 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import os
 import sys
 
-from .base import (SQLDB, SQLRecord, build_sql_query)
+from .base import (SQLDB, SQLRecord, build_sql_query, _has_module,
+					_get_connection_pool, _get_row_class, _log_query)
 
 
 __all__ = ["MySQLDB", "query_mysql_db", "query_mysql_db_generic"]
 
 
-HAS_MYSQLDB = HAS_PYMYSQL = False
-
-try:
-	import MySQLdb
-except ImportError:
-	try:
-		import pymysql as MySQLdb
-	except ImportError:
-		HAS_PYMYSQL = False
-	else:
-		from pymysql import cursors
-		HAS_PYMYSQL = True
-else:
-	from MySQLdb import cursors
-	HAS_MYSQLDB = True
+## Only check availability here, drivers are imported on first use
+HAS_MYSQLDB = _has_module('MySQLdb')
+HAS_PYMYSQL = not HAS_MYSQLDB and _has_module('pymysql')
 
 HAS_MYSQL = HAS_MYSQLDB or HAS_PYMYSQL
 
 
+## Driver modules, imported on first use by :func:`_get_mysql_module`
+## and :func:`_get_mysql_cursors`
+_mysql_mod = None
+_mysql_cursors = None
+
+
+def _get_mysql_module():
+	"""
+	Import MySQL driver module (MySQLdb or pymysql)
+	"""
+	global _mysql_mod
+	if _mysql_mod is None:
+		if HAS_MYSQLDB:
+			import MySQLdb
+			_mysql_mod = MySQLdb
+		else:
+			import pymysql
+			_mysql_mod = pymysql
+	return _mysql_mod
+
+
+def _get_mysql_cursors():
+	"""
+	Import cursors module of MySQL driver
+	"""
+	global _mysql_cursors
+	if _mysql_cursors is None:
+		if HAS_MYSQLDB:
+			from MySQLdb import cursors
+		else:
+			from pymysql import cursors
+		_mysql_cursors = cursors
+	return _mysql_cursors
+
+
+def _mysql_connect(db, host, user, passwd, port):
+	"""
+	Open new connection to MySQL database
+	"""
+	MySQLdb = _get_mysql_module()
+	cursors = _get_mysql_cursors()
+	return MySQLdb.connect(host=host, user=user, passwd=passwd, db=db,
+			port=port, cursorclass=cursors.DictCursor, use_unicode=True)
+
+
+def _get_mysql_pool(db, host, user, passwd, port):
+	"""
+	Get pool of reusable connections to MySQL database
+	"""
+	creator = lambda: _mysql_connect(db, host, user, passwd, port)
+	## ping raises an error if the server has closed the connection
+	check = lambda conn: conn.ping()
+	return _get_connection_pool(('mysql', host, port, user, passwd, db), creator,
+								check=check)
+
+
 if HAS_MYSQL:
 	class MySQLDB(SQLDB):
 		"""
@@ -49,6 +94,9 @@ if HAS_MYSQL:
 			int, MySQL server port number
 			(default: 3306)
 		"""
+		## Not supported by MySQL (only by MariaDB)
+		_index_if_not_exists = False
+
 		def __init__(self, db, host, user, passwd, port=3306):
 			self.db = db
 			self.host = host
@@ -61,15 +109,15 @@ if HAS_MYSQL:
 			self.connection.close()
 
 		def connect(self):
-			self.connection = MySQLdb.connect(host=self.host, user=self.user,
-					passwd=self.passwd, db=self.db, port=self.port,
-					cursorclass=cursors.DictCursor, use_unicode=True)
+			self.connection = _mysql_connect(self.db, self.host, self.user,
+											self.passwd, self.port)
 
 		def list_tables(self):
-			cursor = self.get_cursor()
+			## Plain cursor returning tuples instead of dicts
+			cursor = self.connection.cursor(_get_mysql_cursors().Cursor)
 			#cursor.execute("USE %s" % self.db)
 			cursor.execute("SHOW TABLES")
-			return [rec.values()[0] for rec in cursor.fetchall()]
+			return [row[0] for row in cursor.fetchall()]
 
 		def get_column_info(self,
 			table_name):
@@ -149,7 +197,10 @@ if HAS_MYSQL:
 		port=3306,
 		verbose=False,
 		print_table=False,
-		errf=None):
+		errf=None,
+		batch_size=10000,
+		values=(),
+		namedtuples=False):
 		"""
 		Generic query of MySQL database table, returning each record as a dict
 
@@ -174,33 +225,81 @@ if HAS_MYSQL:
 			(default: False)
 		:param errf:
 			file object, where to print errors
+		:param batch_size:
+			int, number of records to fetch from the server at once
+			(default: 10000)
+		:param values:
+			tuple or dict, containing values or named parameters to be
+			substituted in the query
+			(default: ())
+		:param namedtuples:
+			bool, whether to return records as namedtuples rather than
+			dicts. These take less memory and support access by
+			attribute or position, but not by column name as key.
+			(default: False)
 
 		:return:
-			generator object, yielding a dictionary for each record
+			generator object, yielding a dictionary (or namedtuple)
+			for each record.
+			The connection is returned to the pool when the generator is
+			exhausted, closed or garbage collected, so call its close()
+			method if not all records are read.
 		"""
+		cursors = _get_mysql_cursors()
 		if print_table:
 			cursor_class = cursors.Cursor
+		elif namedtuples:
+			## Unbuffered cursors, rows are streamed from the server
+			cursor_class = cursors.SSCursor
 		else:
-			cursor_class = cursors.DictCursor
-		conn = MySQLdb.connect(host=host, user=user, passwd=passwd, db=db,
-				port=port, cursorclass=cursor_class, use_unicode=True)
-		cur = conn.cursor()
-
-		if errf !=None:
-			errf.write("%s\n" % query)
-			errf.flush()
-		elif verbose:
-			print(query)
-
-		cur.execute(query)
+			cursor_class = cursors.SSDictCursor
+
+		pool = _get_mysql_pool(db, host, user, passwd, port)
+		conn = pool.getconn()
+		try:
+			cur = conn.cursor(cursor_class)
+
+			_log_query(query, verbose, errf)
+			if values:
+				cur.execute(query, values)
+			else:
+				cur.execute(query)
+		except:
+			pool.putconn(conn)
+			raise
+
 		if print_table:
-			import prettytable as pt
-			tab = pt.from_db_cursor(cur)
-			print(tab)
+			try:
+				import prettytable as pt
+				tab = pt.from_db_cursor(cur)
+				print(tab)
+			finally:
+				pool.putconn(conn)
 		else:
-			return cur.fetchall()
-		cur.close()
-		conn.close()
+			def gen_records():
+				try:
+					## Dummy first item, consumed below, so that the finally
+					## clause also runs if the generator is never iterated
+					yield
+					if namedtuples:
+						Row = _get_row_class([rec[0] for rec in cur.description])
+					while True:
+						recs = cur.fetchmany(batch_size)
+						if not recs:
+							break
+						if namedtuples:
+							for rec in recs:
+								yield Row._make(rec)
+						else:
+							for rec in recs:
+								yield rec
+				finally:
+					## Closing unbuffered cursor discards unread rows
+					cur.close()
+					pool.putconn(conn)
+			records = gen_records()
+			next(records)
+			return records
 
 
 	def query_mysql_db(
@@ -218,7 +317,10 @@ if HAS_MYSQL:
 		port=3306,
 		verbose=False,
 		print_table=False,
-		errf=None):
+		errf=None,
+		batch_size=10000,
+		values=(),
+		namedtuples=False):
 		"""
 		Read table from MySQL database, returning each record as a dict
 
@@ -251,15 +353,21 @@ if HAS_MYSQL:
 		:param verbose:
 		:param print_table:
 		:param errf:
+		:param batch_size:
+		:param values:
+		:param namedtuples:
 			see :func:`query_mysql_db_generic`
 
 		:return:
-			generator object, yielding a dictionary for each record
+			generator object, yielding a dictionary (or namedtuple)
+			for each record
 		"""
 		query = build_sql_query(table_clause, column_clause, join_clause,
 						where_clause, having_clause, order_clause, group_clause)
 		return query_mysql_db_generic(db, host, user, passwd, query, port=port,
-							verbose=verbose, print_table=print_table, errf=errf)
+							verbose=verbose, print_table=print_table, errf=errf,
+							batch_size=batch_size, values=values,
+							namedtuples=namedtuples)
 
 
 
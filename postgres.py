@@ -6,30 +6,68 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import os
 import sys
+import re
 
-from .base import (SQLDB, SQLRecord, build_sql_query)
+from .base import (SQLDB, SQLRecord, build_sql_query, _has_module,
+					_get_connection_pool, _get_row_class, _log_query)
 
 
 __all__ = ["PgSQLDB", "query_pgsql_db", "query_pgsql_db_generic"]
 
 
-HAS_PSYCOPG2 = False
-HAS_PG8000 = False
+## Statements that can be run through a server-side (named) cursor,
+## i.e. DECLARE ... CURSOR FOR <query>
+_CURSOR_QUERY_RE = re.compile(r'^\s*\(*\s*(SELECT|WITH|VALUES)\b', re.IGNORECASE)
 
-try:
-	import psycopg2
-except ImportError:
-	try:
-		import pg8000
-	except:
-		pass
-	else:
-		HAS_PG8000 = True
-else:
-	HAS_PSYCOPG2 = True
+
+## Only check availability here, drivers are imported on first use
+HAS_PSYCOPG2 = _has_module('psycopg2')
+HAS_PG8000 = not HAS_PSYCOPG2 and _has_module('pg8000')
 
 HAS_POSTGRES = HAS_PSYCOPG2 or HAS_PG8000
 
+
+## Driver module, imported on first use by :func:`_get_pgsql_module`
+_pg_mod = None
+
+
+def _get_pgsql_module():
+	"""
+	Import PostgreSQL driver module (psycopg2 or pg8000)
+	"""
+	global _pg_mod
+	if _pg_mod is None:
+		if HAS_PSYCOPG2:
+			import psycopg2
+			import psycopg2.extras
+			_pg_mod = psycopg2
+		else:
+			import pg8000
+			_pg_mod = pg8000
+	return _pg_mod
+
+
+def _pgsql_connect(db, host, user, passwd, port):
+	"""
+	Open new connection to PostgreSQL database
+	"""
+	pg = _get_pgsql_module()
+	if HAS_PSYCOPG2:
+		return pg.connect(host=host, user=user, password=passwd,
+				database=db, port=port, cursor_factory=pg.extras.DictCursor)
+	else:
+		return pg.connect(host=host, user=user, password=passwd,
+				database=db, port=port)
+
+
+def _get_pgsql_pool(db, host, user, passwd, port):
+	"""
+	Get pool of reusable connections to PostgreSQL database
+	"""
+	creator = lambda: _pgsql_connect(db, host, user, passwd, port)
+	return _get_connection_pool(('pgsql', host, port, user, passwd, db), creator)
+
+
 if HAS_POSTGRES:
 	class PgSQLDB(SQLDB):
 		"""
@@ -46,33 +84,54 @@ if HAS_POSTGRES:
 		:param port:
 			int, PostgreSQL server port number
 			(default: 5432)
+		:param autocommit:
+			bool, whether or not to run each statement in its own
+			transaction. This saves the implicit BEGIN and the
+			ROLLBACK/COMMIT round trips for read-only use, but write
+			operations can then not be dry run (or rolled back).
+			(default: False)
 		"""
-		def __init__(self, db, host, user, passwd, port=5432):
+		def __init__(self, db, host, user, passwd, port=5432, autocommit=False):
 			self.db = db
 			self.host = host
 			self.user = user
 			self.passwd = passwd
 			self.port = port
+			self.autocommit = autocommit
 			self.connect()
 
 		def connect(self):
+			self.connection = _pgsql_connect(self.db, self.host, self.user,
+											self.passwd, self.port)
+			if self.autocommit:
+				## Supported by both psycopg2 and pg8000
+				self.connection.autocommit = True
+
+		def _executemany(self, sql, seq_of_values):
 			if HAS_PSYCOPG2:
-				self.connection = psycopg2.connect(host=self.host, user=self.user,
-						password=self.passwd, database=self.db, port=self.port,
-						cursor_factory=psycopg2.extras.DictCursor)
+				## psycopg2's executemany does one round trip per item
+				pg = _get_pgsql_module()
+				pg.extras.execute_batch(self.get_cursor(), sql, seq_of_values)
 			else:
-				self.connection = pg8000.connect(host=self.host, user=self.user,
-						password=self.passwd, database=self.db, port=self.port)
+				super(PgSQLDB, self)._executemany(sql, seq_of_values)
 
-		def _gen_sql_records(self, cursor):
+		def _gen_sql_records(self, cursor, raw=False, batch_size=1000):
 			if HAS_PSYCOPG2:
-				super(PgSQLDB, self)._gen_sql_records(cursor)
+				for rec in super(PgSQLDB, self)._gen_sql_records(cursor, raw=raw,
+														batch_size=batch_size):
+					yield rec
 			else:
 				## Manually convert each row to a dict
 				fields = [rec[0] for rec in cursor.description]
-				for row in cursor.fetchall():
-					dict_row = {fields[i]: row[i] for i in range(len(fields))}
-					yield SQLRecord(dict_row, self.db)
+				while True:
+					rows = cursor.fetchmany(batch_size)
+					if not rows:
+						break
+					for row in rows:
+						if raw:
+							yield dict(zip(fields, row))
+						else:
+							yield SQLRecord(dict(zip(fields, row)), self)
 
 		def list_tables(self):
 			cursor = self.get_cursor()
@@ -89,7 +148,10 @@ if HAS_POSTGRES:
 		query,
 		port=5432,
 		verbose=False,
-		errf=None):
+		errf=None,
+		batch_size=10000,
+		values=(),
+		namedtuples=False):
 		"""
 		Generic query of Postgres database table, returning each record as a dict
 
@@ -110,36 +172,92 @@ if HAS_POSTGRES:
 			bool, whether or not to print the query (default: False)
 		:param errf:
 			file object, where to print errors
+		:param batch_size:
+			int, number of records to fetch from the server at once
+			(default: 10000)
+		:param values:
+			tuple or dict, containing values or named parameters to be
+			substituted in the query
+			(default: ())
+		:param namedtuples:
+			bool, whether to return records as namedtuples rather than
+			dicts. These take less memory and support access by
+			attribute or position, but not by column name as key.
+			(default: False)
 
 		:return:
-			generator object, yielding a dictionary for each record
+			generator object, yielding a dictionary (or namedtuple)
+			for each record.
+			The connection is returned to the pool when the generator is
+			exhausted, closed or garbage collected, so call its close()
+			method if not all records are read.
 		"""
-		if HAS_PSYCOPG2:
-			conn = psycopg2.connect(host=host, user=user, password=passwd, database=db,
-					port=port, cursor_factory=psycopg2.extras.DictCursor)
-			#c = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-		else:
-			conn = pg8000.connect(host=host, user=user, password=passwd, database=db,
-					port=port)
-		cur = conn.cursor()
+		pool = _get_pgsql_pool(db, host, user, passwd, port)
+		conn = pool.getconn()
+		try:
+			## Other statements (SHOW, EXPLAIN, DDL, ...) cannot be declared
+			## as a cursor, and run through a client-side cursor
+			server_side = HAS_PSYCOPG2 and _CURSOR_QUERY_RE.match(query) is not None
+			if server_side:
+				## Named cursor = server-side cursor, rows are streamed
+				if namedtuples:
+					pg = _get_pgsql_module()
+					cur = conn.cursor(name='simpledb_stream',
+									cursor_factory=pg.extensions.cursor)
+				else:
+					cur = conn.cursor(name='simpledb_stream')
+			elif HAS_PSYCOPG2 and namedtuples:
+				pg = _get_pgsql_module()
+				cur = conn.cursor(cursor_factory=pg.extensions.cursor)
+			else:
+				cur = conn.cursor()
 
-		if errf !=None:
-			errf.write("%s\n" % query)
-			errf.flush()
-		elif verbose:
-			print(query)
+			_log_query(query, verbose, errf)
+			if values:
+				cur.execute(query, values)
+			else:
+				cur.execute(query)
+		except:
+			pool.putconn(conn)
+			raise
 
-		cur.execute(query)
-		if HAS_PSYCOPG2:
-			return cur.fetchall()
-		else:
-			## Manually convert each row to a dict
-			def to_dict_cursor():
-				fields = [rec[0] for rec in cur.description]
-				num_fields = len(fields)
-				for row in cur.fetchall():
-					yield {fields[i]: row[i] for i in range(num_fields)}
-			return to_dict_cursor()
+		def gen_records():
+			try:
+				## Dummy first item, consumed below, so that the finally
+				## clause also runs if the generator is never iterated
+				yield
+				if not server_side and cur.description is None:
+					## Statement does not return rows
+					return
+				fields = None
+				while True:
+					rows = cur.fetchmany(batch_size)
+					if not rows:
+						break
+					if fields is None:
+						## Description of named cursor is only set after first fetch
+						fields = [rec[0] for rec in cur.description]
+						if namedtuples:
+							Row = _get_row_class(fields)
+					if namedtuples:
+						for row in rows:
+							yield Row._make(row)
+					elif HAS_PSYCOPG2:
+						for row in rows:
+							yield row
+					else:
+						## Manually convert each row to a dict
+						for row in rows:
+							yield dict(zip(fields, row))
+			finally:
+				try:
+					cur.close()
+				except Exception:
+					pass
+				pool.putconn(conn)
+		records = gen_records()
+		next(records)
+		return records
 
 
 	def query_pgsql_db(
@@ -156,7 +274,10 @@ if HAS_POSTGRES:
 		group_clause="",
 		port=5432,
 		verbose=False,
-		errf=None):
+		errf=None,
+		batch_size=10000,
+		values=(),
+		namedtuples=False):
 		"""
 		Read table from Postgres database, returning each record as a dict
 
@@ -190,14 +311,28 @@ if HAS_POSTGRES:
 			bool, whether or not to print the query (default: False)
 		:param errf:
 			file object, where to print errors
+		:param batch_size:
+			int, number of records to fetch from the server at once
+			(default: 10000)
+		:param values:
+			tuple or dict, containing values or named parameters to be
+			substituted in the query
+			(default: ())
+		:param namedtuples:
+			bool, whether to return records as namedtuples rather than
+			dicts. These take less memory and support access by
+			attribute or position, but not by column name as key.
+			(default: False)
 
 		:return:
-			generator object, yielding a dictionary for each record
+			generator object, yielding a dictionary (or namedtuple)
+			for each record
 		"""
 		query = build_sql_query(table_clause, column_clause, join_clause,
 						where_clause, having_clause, order_clause, group_clause)
 		return query_pgsql_db_generic(db, host, user, passwd, query, port=port,
-										verbose=verbose, errf=errf)
+										verbose=verbose, errf=errf, batch_size=batch_size,
+										values=values, namedtuples=namedtuples)
 
 
 
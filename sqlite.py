@@ -1,55 +1,333 @@
 """
 Provides read/write access to SQLite databases.
+
+If installed, pysqlite3 (which bundles a recent SQLite library and
+may be compiled with extension loading enabled) is used instead of
+the standard library sqlite3 module. Both have the same interface.
 """
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import os
 import sys
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-from .base import (SQLDB, SQLRecord, build_sql_query)
+from .base import (SQLDB, SQLRecord, build_sql_query, _WHERE_RE, _log_query)
 
-import sqlite3
+try:
+	from pysqlite3 import dbapi2 as sqlite3
+except ImportError:
+	import sqlite3
 
 
 __all__ = ["SQLiteDB", "query_sqlite_db", "query_sqlite_db_generic"]
 
 
+def _set_pragmas(
+	connection,
+	journal_mode=None,
+	synchronous="NORMAL",
+	cache_size_kb=64000,
+	mmap_size=268435456,
+	temp_store="MEMORY"):
+	"""
+	Tune SQLite connection with PRAGMA statements.
+	Parameters set to None are left at the SQLite default.
+
+	:param connection:
+		instance of :class:`sqlite3.Connection`
+	:param journal_mode:
+		str, journal mode, e.g. "DELETE" or "WAL" (write-ahead log,
+		allowing readers to proceed concurrently with a writer)
+		In WAL mode, readers see a snapshot of the database as it was
+		at the start of their read transaction. Note that WAL mode is
+		persistent in the database file. The journal mode is only
+		changed if it differs from the current one, and left as is
+		if it cannot be changed (e.g., if the database file is not
+		writable or locked by another connection).
+		(default: None, keep current journal mode)
+	:param synchronous:
+		str, synchronous mode, e.g. "FULL" or "NORMAL" (which is safe
+		in WAL mode and avoids an fsync at every commit)
+		(default: "NORMAL")
+	:param cache_size_kb:
+		int, size of page cache in kB
+		(default: 64000)
+	:param mmap_size:
+		int, maximum number of bytes used for memory-mapped I/O
+		(default: 268435456 = 256 MB)
+	:param temp_store:
+		str, where to store temporary tables and indices: "DEFAULT",
+		"FILE" or "MEMORY"
+		(default: "MEMORY")
+	"""
+	if journal_mode:
+		try:
+			current_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+			if current_mode.upper() != journal_mode.upper():
+				connection.execute('PRAGMA journal_mode=%s' % journal_mode)
+		except sqlite3.OperationalError:
+			## Read-only or locked database file, keep current mode
+			pass
+
+	pragmas = []
+	if synchronous:
+		pragmas.append('synchronous=%s' % synchronous)
+	if cache_size_kb:
+		## Negative value = size in kB rather than number of pages
+		pragmas.append('cache_size=%d' % -abs(cache_size_kb))
+	if mmap_size is not None:
+		pragmas.append('mmap_size=%d' % mmap_size)
+	if temp_store:
+		pragmas.append('temp_store=%s' % temp_store)
+	for pragma in pragmas:
+		connection.execute('PRAGMA %s' % pragma)
+
+
 class SQLiteDB(SQLDB):
 	"""
 	Class representing SQLite database.
 
 	:param db_filespec:
 		str, full path to sqlite database (can also be ':memory:')
+	:param journal_mode:
+	:param synchronous:
+	:param cache_size_kb:
+	:param mmap_size:
+	:param temp_store:
+		connection settings, see :func:`_set_pragmas`
+		(None = SQLite default)
+	:param check_same_thread:
+		bool, whether or not to restrict use of the connection to the
+		thread that created it. Set to False to share the connection
+		between (reading) threads.
+		(default: True)
+	:param read_only:
+		bool, whether or not to open the database in read-only mode
+		(Python 3 only). The journal mode cannot be changed in this mode.
+		(default: False)
+	:param timeout:
+		float, number of seconds to wait for a lock held by another
+		connection before raising a 'database is locked' error
+		(default: 5.)
+	:param separate_reader:
+		bool, whether or not to open a second, read-only connection
+		(Python 3 only) for :meth:`query`, so that (in WAL mode) long
+		reads do not hold up writes on the main connection and vice
+		versa. Note that this connection does not see changes that
+		have not yet been committed on the main connection. Other
+		methods, including :meth:`query_generic`, keep using the main
+		connection, as they may also be used to write.
+		Ignored for in-memory and read-only databases.
+		(default: False)
 	"""
 	_placeholder = '?'
-
-	def __init__(self, db_filespec):
+	## Name of spatialite library found by :meth:`_load_spatialite`
+	## (False if it could not be loaded), shared by all connections
+	_spatialite_lib = None
+	_spatialite_path_added = False
+	## Table names and column info, see :meth:`_get_schema_cache`
+	_schema_cache = None
+
+	def __init__(self, db_filespec,
+		journal_mode=None,
+		synchronous="NORMAL",
+		cache_size_kb=64000,
+		mmap_size=268435456,
+		temp_store="MEMORY",
+		check_same_thread=True,
+		read_only=False,
+		timeout=5.,
+		separate_reader=False):
 		self.db_filespec = db_filespec
+		self.journal_mode = journal_mode
+		self.synchronous = synchronous
+		self.cache_size_kb = cache_size_kb
+		self.mmap_size = mmap_size
+		self.temp_store = temp_store
+		self.check_same_thread = check_same_thread
+		self.read_only = read_only
+		self.timeout = timeout
+		self.separate_reader = separate_reader
 		self.connect()
 
 	def connect(self):
-		self.connection = sqlite3.connect(self.db_filespec, detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES)
-		self.connection.row_factory = sqlite3.Row
+		self.connection = self._open_connection(read_only=self.read_only)
+		self.HAS_SPATIALITE = self._load_spatialite(self.connection)
+
+		self._read_connection = None
+		if (self.separate_reader and not self.read_only
+			and not self.db_filespec in (':memory:', '')):
+			self._read_connection = self._open_connection(read_only=True)
+			self._load_spatialite(self._read_connection)
+
+	def _open_connection(self,
+		read_only=False):
+		"""
+		Open new connection to the database, with row factory and
+		connection settings
+
+		:param read_only:
+			bool, whether or not to open the database in read-only mode
+			(default: False)
+
+		:return:
+			instance of :class:`sqlite3.Connection`
+		"""
+		## Note: timeout sets the SQLite busy timeout
+		kwargs = dict(detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES,
+					check_same_thread=self.check_same_thread, timeout=self.timeout)
+		if read_only:
+			from urllib.request import pathname2url
+			db_uri = 'file:%s?mode=ro' % pathname2url(self.db_filespec)
+			connection = sqlite3.connect(db_uri, uri=True, **kwargs)
+			journal_mode = None
+		else:
+			connection = sqlite3.connect(self.db_filespec, **kwargs)
+			journal_mode = self.journal_mode
+		if self.db_filespec in (':memory:', ''):
+			## In-memory or temporary database, no journal file
+			journal_mode = None
+		connection.row_factory = sqlite3.Row
+		_set_pragmas(connection, journal_mode=journal_mode,
+					synchronous=self.synchronous, cache_size_kb=self.cache_size_kb,
+					mmap_size=self.mmap_size, temp_store=self.temp_store)
+		return connection
+
+	def _get_read_cursor(self):
+		if self._read_connection is not None:
+			return self._read_connection.cursor()
+		else:
+			return self.get_cursor()
+
+	def close(self):
+		"""
+		Close database connection(s)
+		"""
+		if getattr(self, '_read_connection', None) is not None:
+			self._read_connection.close()
+		self.connection.close()
+
+	def _load_spatialite(self, connection):
+		"""
+		Enable spatialite extension if possible.
+		The library search (and PATH modification) is only done for
+		the first connection, subsequent connections directly load the
+		library that was found.
+
+		:param connection:
+			instance of :class:`sqlite3.Connection`
 
-		## Enable spatialite extension if possible
-		self.connection.enable_load_extension(True)
+		:return:
+			bool, whether or not spatialite was loaded
+		"""
+		cls = SQLiteDB
+		if cls._spatialite_lib is False:
+			return False
 		try:
-			self.connection.load_extension('spatialite.dll')
-		except:
-			spatialite_path = os.path.split(sys.executable)[0]
-			spatialite_path = os.path.join(spatialite_path, "GDAL", "mod-spatialite")
-			if not spatialite_path in os.environ["PATH"]:
-				os.environ["PATH"] = spatialite_path + ";" + os.environ["PATH"]
+			connection.enable_load_extension(True)
+		except AttributeError:
+			## Python's sqlite3 compiled without extension support
+			cls._spatialite_lib = False
+			return False
+
+		if cls._spatialite_lib:
+			libs = [cls._spatialite_lib]
+		else:
+			libs = ['spatialite.dll', 'mod_spatialite.dll']
+		for lib in libs:
+			if lib == 'mod_spatialite.dll' and not cls._spatialite_path_added:
+				spatialite_path = os.path.split(sys.executable)[0]
+				spatialite_path = os.path.join(spatialite_path, "GDAL", "mod-spatialite")
+				if not spatialite_path in os.environ["PATH"].split(os.pathsep):
+					os.environ["PATH"] = spatialite_path + os.pathsep + os.environ["PATH"]
+				cls._spatialite_path_added = True
 			try:
-				self.connection.load_extension('mod_spatialite.dll')
+				connection.load_extension(lib)
 			except:
-				print("Warning: [mod_]spatialite.dll could not be loaded!")
-				self.HAS_SPATIALITE = False
+				continue
 			else:
-				self.HAS_SPATIALITE = True
+				cls._spatialite_lib = lib
+				return True
+
+		print("Warning: [mod_]spatialite.dll could not be loaded!")
+		cls._spatialite_lib = False
+		return False
+
+	def _executemany(self, sql, seq_of_values):
+		## Connection.executemany avoids creating a cursor in Python
+		self.connection.executemany(sql, seq_of_values)
+
+	def _raw_cursor(self):
+		"""
+		Get cursor returning plain tuples instead of :class:`sqlite3.Row`
+		objects, for internal queries that only need positional access
+		"""
+		cursor = self.connection.cursor()
+		cursor.row_factory = None
+		return cursor
+
+	@contextmanager
+	def _write_tx(self,
+		dry_run=False,
+		commit=True):
+		"""
+		Context manager wrapping write operations in a transaction that
+		is started with BEGIN IMMEDIATE, i.e. acquiring the write lock
+		up front. Otherwise, the transaction starts as a reader and has
+		to upgrade its lock on the first write, which fails immediately
+		(without waiting for the busy timeout) if another connection
+		wrote in the mean time. If a transaction is already open (e.g.,
+		a previous call with commit=False), it is simply continued.
+
+		:param dry_run:
+			bool, whether or not to roll back the transaction at the end
+			(default: False)
+		:param commit:
+			bool, whether or not to commit the transaction at the end
+			(default: True)
+		"""
+		## Note: in_transaction is not available in Python 2
+		if getattr(self.connection, 'in_transaction', True):
+			yield
 		else:
-			self.HAS_SPATIALITE = True
+			self.connection.execute('BEGIN IMMEDIATE')
+			try:
+				yield
+			except:
+				self.connection.rollback()
+				raise
+		if dry_run:
+			self.connection.rollback()
+		elif commit:
+			self.connection.commit()
+
+	def add_records(self,
+		table_name,
+		recs,
+		dry_run=False,
+		commit=True):
+		with self._write_tx(dry_run=dry_run, commit=commit):
+			super(SQLiteDB, self).add_records(table_name, recs, commit=False)
+
+	def _get_schema_cache(self):
+		"""
+		Get cache of table names and column info. The cache is reset
+		whenever the schema version of the database changes, i.e. after
+		any change to the schema, also by other connections.
+
+		:return:
+			dict with keys 'version', 'tables' and 'columns'
+		"""
+		schema_version = self.connection.execute('PRAGMA schema_version').fetchone()[0]
+		cache = self._schema_cache
+		if cache is None or cache['version'] != schema_version:
+			cache = dict(version=schema_version, tables=None, columns={})
+			self._schema_cache = cache
+		return cache
 
 	def list_tables(self):
 		"""
@@ -58,8 +336,13 @@ class SQLiteDB(SQLDB):
 		return:
 			list of strings, names of database tables
 		"""
-		query = "SELECT name FROM sqlite_master WHERE type='table' ORDER BY NAME"
-		return [rec.name for rec in self.query_generic(query)]
+		cache = self._get_schema_cache()
+		if cache['tables'] is None:
+			query = "SELECT name FROM sqlite_master WHERE type='table' ORDER BY NAME"
+			cursor = self._raw_cursor()
+			cursor.execute(query)
+			cache['tables'] = [row[0] for row in cursor]
+		return list(cache['tables'])
 
 	def get_column_info(self,
 		table_name):
@@ -69,7 +352,8 @@ class SQLiteDB(SQLDB):
 			str, name of database table
 
 		:return:
-			list of dictionaries, one for each column, with following keys:
+			list of :class:`sqlite3.Row` objects (supporting access by key
+			like dictionaries), one for each column, with following keys:
 			- cid: column ID
 			- name: column name
 			- type: column data type
@@ -77,10 +361,15 @@ class SQLiteDB(SQLDB):
 			- dflt_value: default value
 			- pk: whether or not column is primary key
 		"""
-		query = "PRAGMA table_info('%s')" % table_name
-		cursor = self.get_cursor()
-		cursor.execute(query)
-		return [{key: row[key] for key in row.keys()} for row in cursor.fetchall()]
+		cache = self._get_schema_cache()
+		col_info = cache['columns'].get(table_name)
+		if col_info is None:
+			query = "PRAGMA table_info('%s')" % table_name
+			cursor = self.get_cursor()
+			cursor.execute(query)
+			col_info = cursor.fetchall()
+			cache['columns'][table_name] = col_info
+		return list(col_info)
 
 	def create_table(self,
 		table_name,
@@ -93,34 +382,36 @@ class SQLiteDB(SQLDB):
 		:param column_info_list:
 			list of column info specifications; these are either
 			tuples (cid, name, type, notnull, dflt_value, pk)
-			or dictionaries with these keys (as returned by
-			:meth:`get_col_info`).
+			or dictionaries (or :class:`sqlite3.Row` objects) with these
+			keys (as returned by :meth:`get_column_info`).
 			The following data types are supported in sqlite:
 			NULL, INTEGER, REAL, TEXT, DATE, TIMESTAMP, BLOB
 			Note that only name is required, type defaults to NUMERIC,
 			and cid is ignored.
 		"""
-		sql = 'CREATE TABLE %s(' % table_name
-		for i, column_info in enumerate(column_info_list):
+		col_defs = []
+		for column_info in column_info_list:
 			if isinstance(column_info, (list, tuple)):
 				cid, colname, coltype, notnull, dflt_value, primary_key = column_info
 			else:
+				if not isinstance(column_info, dict):
+					## sqlite3.Row
+					column_info = dict(zip(column_info.keys(), column_info))
 				cid = column_info.get('cid', 0)
 				colname = column_info['name']
 				coltype = column_info.get('type', 'NUMERIC')
 				notnull = column_info.get('notnull', 0)
 				dflt_value = column_info.get('dflt_value')
 				primary_key = column_info.get('pk', 0)
-			if i != 0:
-				sql += ', '
-			sql += '%s %s' % (colname, coltype)
+			col_def = '%s %s' % (colname, coltype)
 			if dflt_value:
-				sql += ' default %s' % dflt_value
+				col_def += ' default %s' % dflt_value
 			if notnull:
-				sql += ' NOT NULL'
+				col_def += ' NOT NULL'
 			if primary_key:
-				sql += ' PRIMARY KEY'
-		sql += ')'
+				col_def += ' PRIMARY KEY'
+			col_defs.append(col_def)
+		sql = 'CREATE TABLE %s(%s)' % (table_name, ', '.join(col_defs))
 		self.query_generic(sql)
 		self.connection.commit()
 
@@ -176,21 +467,18 @@ class SQLiteDB(SQLDB):
 		where_clause,
 		dry_run=False):
 		# Not sure if this should be kept
-		if where_clause.lstrip()[:5].upper() == "WHERE":
-			where_clause = where_clause.lstrip()[5:]
-
-		cursor = self.get_cursor()
-		for col_name, col_values in col_dict.items():
-			query = 'UPDATE %s SET %s = ' % (table_name, col_name)
-			#query += ', '.join(['%s = ?' % key for key in col_dict.keys()])
-			query += ', '.join(['?'] * len(col_values))
-			if where_clause:
-				query += ' WHERE %s' % where_clause
-			print(query[:1000])
-			cursor.execute(query, col_values)
-
-		if not dry_run:
-			self.connection.commit()
+		where_clause = _WHERE_RE.sub('', where_clause, count=1)
+
+		with self._write_tx(dry_run=dry_run):
+			cursor = self.get_cursor()
+			for col_name, col_values in col_dict.items():
+				query = 'UPDATE %s SET %s = ' % (table_name, col_name)
+				#query += ', '.join(['%s = ?' % key for key in col_dict.keys()])
+				query += ', '.join(['?'] * len(col_values))
+				if where_clause:
+					query += ' WHERE %s' % where_clause
+				_log_query(query, self.verbose)
+				cursor.execute(query, col_values)
 
 	def update_column(self,
 		table_name,
@@ -207,7 +495,8 @@ class SQLiteDB(SQLDB):
 		:param col_name:
 			string, name of column to update
 		:param col_values:
-			list of column values
+			list of column values, or single value to be set in all
+			records matching :param:`where_clause`
 		:param where_clause:
 			string, where clause (REQUIRED !)
 		:param order_clause:
@@ -217,26 +506,28 @@ class SQLiteDB(SQLDB):
 			bool, whether or not to dry run the operation
 			(default: False)
 		"""
-		## Query row IDs with where_clause
-		row_ids = [rec['rowid'] for rec in self.query(table_name, 'rowid',
-						where_clause=where_clause, order_clause=order_clause)]
-		assert len(row_ids) == len(col_values)
-
-		cursor = self.get_cursor()
-		query = 'UPDATE %s SET %s=' % (table_name, col_name)
-
-		## This does not give any error, but effectively writes all column values to each row!
-		#query += '?'
-		#col_data = [(val,) for val in col_values]
-
-		## Use named parameters
-		query += ':value WHERE rowid=:rowid'
-		col_data = [dict(rowid=row_ids[i], value=col_values[i])
-					for i in range(len(col_values))]
-		cursor.executemany(query, col_data)
-
-		if not dry_run:
-			self.connection.commit()
+		if (not hasattr(col_values, '__len__')
+			or isinstance(col_values, (type(''), bytes))):
+			## Same value for all records, no need to fetch row IDs
+			query = 'UPDATE %s SET %s=?' % (table_name, col_name)
+			if where_clause:
+				query += ' WHERE %s' % _WHERE_RE.sub('', where_clause)
+			with self._write_tx(dry_run=dry_run):
+				self.connection.execute(query, (col_values,))
+			return
+
+		with self._write_tx(dry_run=dry_run):
+			## Query row IDs with where_clause
+			query = build_sql_query(table_name, 'rowid', where_clause=where_clause,
+									order_clause=order_clause)
+			cursor = self._raw_cursor()
+			cursor.execute(query)
+			row_ids = [row[0] for row in cursor]
+			assert len(row_ids) == len(col_values)
+
+			## Positional parameters, avoiding dict creation and lookup for each row
+			query = 'UPDATE %s SET %s=? WHERE rowid=?' % (table_name, col_name)
+			self._executemany(query, zip(col_values, row_ids))
 
 	def vacuum(self,
 		table_name=None):
@@ -277,11 +568,10 @@ class SQLiteDB(SQLDB):
 		:return:
 			list of strings, SQL commands
 		"""
-		query = 'SELECT * FROM sqlite_master'
-		sql_commands = []
-		for rec in self.query_generic(query):
-			sql_commands.append(rec['sql'])
-		return sql_commands
+		query = 'SELECT sql FROM sqlite_master'
+		cursor = self._raw_cursor()
+		cursor.execute(query)
+		return [row[0] for row in cursor]
 
 	def get_sqlite_version(self):
 		"""
@@ -291,7 +581,7 @@ class SQLiteDB(SQLDB):
 			string, SQLite version
 		"""
 		query = "SELECT sqlite_version()"
-		return list(self.query_generic(query))[0].values()[0]
+		return self.connection.execute(query).fetchone()[0]
 
 	def get_spatialite_version(self):
 		"""
@@ -302,10 +592,10 @@ class SQLiteDB(SQLDB):
 		"""
 		if self.HAS_SPATIALITE:
 			query = "SELECT spatialite_version()"
-			return list(self.query_generic(query))[0].values()[0]
+			return self.connection.execute(query).fetchone()[0]
 
 	def init_spatialite(self,
-		populate_spatial_ref_sys="all"):
+		populate_spatial_ref_sys="wgs84"):
 		"""
 		Generate metadata table required by SpatiaLite
 
@@ -318,15 +608,29 @@ class SQLiteDB(SQLDB):
 			- "empty": will simply create the spatial_ref_sys table;
 				no row will be inserted, this task will need to be handled
 				manually at a later time
-			(default: "all")
+			Other SRIDs are added when needed by :meth:`add_geometry_column`
+			(default: "wgs84")
 		"""
 		if populate_spatial_ref_sys in ("empty", "wgs84"):
-			query = "SELECT InitSpatialMetadata('%s')"
-			query %= populate_spatial_ref_sys.upper()
+			query = "SELECT InitSpatialMetadata(?)"
+			values = (populate_spatial_ref_sys.upper(),)
 		else:
 			query = "SELECT InitSpatialMetadata()"
+			values = ()
 
-		return self.query_generic(query)
+		return self.query_generic(query, values)
+
+	def _ensure_srid(self, srid):
+		"""
+		Add definition of particular SRID to table 'spatial_ref_sys'
+		(from the EPSG dataset built into spatialite) if it is missing
+
+		:param srid:
+			int, spatial reference identifier
+		"""
+		query = "SELECT 1 FROM spatial_ref_sys WHERE srid = ?"
+		if self.connection.execute(query, (srid,)).fetchone() is None:
+			self.query_generic("SELECT InsertEpsgSrid(?)", (srid,))
 
 	def add_geometry_column(self,
 		table_name,
@@ -361,9 +665,10 @@ class SQLiteDB(SQLDB):
 		"""
 		# See: http://www.gaia-gis.it/spatialite-2.4.0-4/splite-python.html
 		# and http://false.ekta.is/2011/04/pyspatialite-spatial-queries-in-python-built-on-sqlite3/
-		query = "SELECT AddGeometryColumn('%s', '%s', %d, '%s', '%s', %d)"
-		query %= (table_name, col_name, srid, geom_type, dim, not_null)
-		return self.query_generic(query)
+		self._ensure_srid(int(srid))
+		query = "SELECT AddGeometryColumn(?, ?, ?, ?, ?, ?)"
+		values = (table_name, col_name, int(srid), geom_type, dim, int(not_null))
+		return self.query_generic(query, values)
 
 	def discard_geometry_column(self, table_name, geom_col="geom"):
 		"""
@@ -377,9 +682,8 @@ class SQLiteDB(SQLDB):
 			string, name of geometry column
 			(default: "geom")
 		"""
-		query = "SELECT DiscardGeometryColumn('%s', '%s')"
-		query %= (table_name, geom_col)
-		self.query_generic(query)
+		query = "SELECT DiscardGeometryColumn(?, ?)"
+		self.query_generic(query, (table_name, geom_col))
 		# Commit required?
 
 	def drop_geo_table(self, table_name):
@@ -392,8 +696,8 @@ class SQLiteDB(SQLDB):
 		:param table_name:
 			string, name of database table
 		"""
-		query = "SELECT DropGeoTable('%s')" % table_name
-		self.query_generic(query)
+		query = "SELECT DropGeoTable(?)"
+		self.query_generic(query, (table_name,))
 
 	def create_points_from_columns(self,
 		table_name,
@@ -433,27 +737,26 @@ class SQLiteDB(SQLDB):
 			bool, whether or not to dry run the operation
 			(default: False)
 		"""
-		from collections import OrderedDict
-		rowid_wkt_dict = OrderedDict()
-
-		column_clause = [x_col, y_col, "rowid"]
+		## Build points inside SQLite, rather than reading the coordinates
+		## and writing back WKT strings for each record
 		if z_col:
-			column_clause.append(z_col)
-		for rec in self.query(table_name, column_clause, where_clause=where_clause):
-			if z_col:
-				wkt = "POINTZ(%s %s %s)" % (rec[x_col], rec[y_col], rec[z_col])
-			else:
-				wkt = "POINT(%s %s)" % (rec[x_col], rec[y_col])
-			rowid_wkt_dict[rec["rowid"]] = wkt
-		self.set_geometry_from_wkt(table_name, rowid_wkt_dict, geom_col=geom_col,
-									srid=srid, dry_run=dry_run)
+			point = "MakePointZ(%s, %s, %s, %d)" % (x_col, y_col, z_col, srid)
+		else:
+			point = "MakePoint(%s, %s, %d)" % (x_col, y_col, srid)
+		query = "UPDATE %s SET %s=%s" % (table_name, geom_col, point)
+		if where_clause:
+			query += " WHERE %s" % _WHERE_RE.sub('', where_clause)
+		_log_query(query, self.verbose)
+		with self._write_tx(dry_run=dry_run):
+			self.connection.execute(query)
 
 	def set_geometry_from_wkt(self,
 		table_name,
 		rowid_wkt_dict,
 		geom_col="geom",
 		srid=4326,
-		dry_run=False):
+		dry_run=False,
+		commit=True):
 		"""
 		Create spatialite geometric object for table records from WKT
 		specification.
@@ -471,16 +774,16 @@ class SQLiteDB(SQLDB):
 		:param dry_run:
 			bool, whether or not to dry run the operation
 			(default: False)
+		:param commit:
+			bool, whether or not to commit the transaction
+			(default: True)
 		"""
-		cursor = self.get_cursor()
-		query = "UPDATE %s SET %s=GeomFromText(?,%d) WHERE rowid=?"
-		query %= (table_name, geom_col, srid)
-		for rowid, wkt in rowid_wkt_dict.items():
-			col_value = (wkt, rowid)
-			cursor.execute(query, col_value)
-
-		if not dry_run:
-			self.connection.commit()
+		query = "UPDATE %s SET %s=GeomFromText(?,?) WHERE rowid=?"
+		query %= (table_name, geom_col)
+		srid = int(srid)
+		with self._write_tx(dry_run=dry_run, commit=commit):
+			self._executemany(query, ((wkt, srid, rowid)
+									for rowid, wkt in rowid_wkt_dict.items()))
 
 	def get_geometry_types(self,
 		table_name,
@@ -495,13 +798,16 @@ class SQLiteDB(SQLDB):
 			(default: "geom")
 
 		:return:
-			string, geometry type
+			set of strings, geometry types
 		"""
 		#query = "SELECT * from geometry_columns"
-		query = "SELECT GeometryType(%s) FROM %s"
+		## Remove duplicates in SQLite rather than transferring all rows
+		query = "SELECT DISTINCT GeometryType(%s) FROM %s"
 		query %= (geom_col, table_name)
 
-		return set([rec.values()[0] for rec in list(self.query_generic(query))])
+		cursor = self._raw_cursor()
+		cursor.execute(query)
+		return set(row[0] for row in cursor)
 
 	def import_table_from_gis_file(self,
 		gis_filespec,
@@ -541,7 +847,6 @@ class SQLiteDB(SQLDB):
 		col_info_list = [dict(name=col_name) for col_name in col_names]
 		self.create_table(table_name, col_info_list)
 
-		## Write records
 		geometries = []
 		db_records = []
 		for rec in gis_records:
@@ -549,9 +854,8 @@ class SQLiteDB(SQLDB):
 			geometries.append(geom)
 			rec.pop('#')
 			db_records.append(rec)
-		self.add_records(table_name, db_records)
 
-		## Write geometries
+		## Add geometry column
 		self.init_spatialite()
 		geometry_types = [obj.GetGeometryName() for obj in geometries]
 		if len(geometries) > 1:
@@ -559,9 +863,16 @@ class SQLiteDB(SQLDB):
 		else:
 			geom_type = geometry_types[0]
 		self.add_geometry_column(table_name, geom_col, geom_type, srid=srid)
+
+		## Write records and geometries in a single transaction
+		self.add_records(table_name, db_records, commit=False)
 		rowid_wkt_dict = {rowid+1: geom.ExportToWkt() for rowid, geom in
 							enumerate(geometries)}
-		self.set_geometry_from_wkt(table_name, rowid_wkt_dict, geom_col, srid=srid)
+		self.set_geometry_from_wkt(table_name, rowid_wkt_dict, geom_col, srid=srid,
+									commit=False)
+		self.connection.commit()
+		## Create index after writing geometries, rather than updating it for each row
+		self.create_spatial_index(table_name, geom_col)
 
 	def compress_geometry(self,
 		table_name,
@@ -580,15 +891,93 @@ class SQLiteDB(SQLDB):
 		self.query_generic(query)
 		self.connection.commit()
 
-	#TODO: how to create spatial index??
+	def create_spatial_index(self,
+		table_name,
+		geom_col="geom"):
+		"""
+		Create spatial (R*Tree) index on geometry column, which allows
+		filtering on bounding box without scanning the whole table.
+		The index is kept up to date by triggers created by spatialite.
+
+		:param table_name:
+			string, name of database table
+		:param geom_col:
+			string, name of geometry column
+			(default: "geom")
+		"""
+		query = "SELECT CreateSpatialIndex(?, ?)"
+		self.query_generic(query, (table_name, geom_col))
+		self.connection.commit()
+
+
+
+## Connections used by :func:`query_sqlite_db_generic`. SQLite connections
+## can only be used in the thread that created them, so each thread has its
+## own, in an OrderedDict keyed by db_filespec, least recently used first.
+## They are closed when the thread ends.
+_sqlite_local = threading.local()
+_MAX_SQLITE_CONNECTIONS = 32
+
 
+def _get_thread_sqlite_connections():
+	"""
+	Get cached SQLite connections of the current thread
+
+	:return:
+		OrderedDict, mapping db_filespecs to instances of
+		:class:`sqlite3.Connection`
+	"""
+	connections = getattr(_sqlite_local, 'connections', None)
+	if connections is None:
+		connections = _sqlite_local.connections = OrderedDict()
+	return connections
+
+
+def _get_sqlite_connection(db_filespec):
+	"""
+	Get connection to SQLite database for the current thread,
+	reusing a previously opened one if possible
+
+	:param db_filespec:
+		str, full path to sqlite database
+
+	:return:
+		instance of :class:`sqlite3.Connection`
+	"""
+	connections = _get_thread_sqlite_connections()
+	db = connections.pop(db_filespec, None)
+	if db is None:
+		## Autocommit mode: these connections are only used for reading
+		db = sqlite3.connect(db_filespec, isolation_level=None)
+		db.row_factory = sqlite3.Row
+		## Do not change the (persistent) journal mode of the database
+		## file just by reading from it
+		_set_pragmas(db, journal_mode=None)
+		## Drop least recently used connection(s). These are not closed
+		## explicitly, as generators returned by query_sqlite_db_generic
+		## may still be reading from them, but when garbage collected
+		while len(connections) >= _MAX_SQLITE_CONNECTIONS:
+			connections.popitem(last=False)
+	connections[db_filespec] = db
+	return db
+
+
+@atexit.register
+def _close_sqlite_connections():
+	## Only connections of the calling (main) thread can be closed here,
+	## those of other threads are closed when these threads end
+	connections = _get_thread_sqlite_connections()
+	for db in list(connections.values()):
+		db.close()
+	connections.clear()
 
 
 def query_sqlite_db_generic(
 	db_filespec,
 	query,
 	verbose=False,
-	print_table=False):
+	print_table=False,
+	values=()):
 	"""
 	Read table from sqlite database, returning each record as a dict
 
@@ -602,22 +991,24 @@ def query_sqlite_db_generic(
 		bool, whether or not to print results of query in a table
 		rather than returning records
 		(default: False)
+	:param values:
+		tuple or dict, containing values or named parameters to be
+		substituted in the query
+		(default: ())
 
 	:return:
 		generator object, yielding a dictionary for each record
 	"""
-	db = sqlite3.connect(db_filespec)
-	db.row_factory = sqlite3.Row
+	db = _get_sqlite_connection(db_filespec)
 	cur = db.cursor()
-	if verbose:
-		print(query)
-	cur.execute(query)
+	_log_query(query, verbose)
+	cur.execute(query, values)
 	if print_table:
 		import prettytable as pt
 		tab = pt.from_db_cursor(cur)
 		print(tab)
 	else:
-		return cur.fetchall()
+		return (row for row in cur)
 
 
 def query_sqlite_db(
@@ -630,7 +1021,8 @@ def query_sqlite_db(
 	order_clause="",
 	group_clause="",
 	verbose=False,
-	print_table=False):
+	print_table=False,
+	values=()):
 	"""
 	Read table from sqlite database, returning each record as a dict
 
@@ -653,6 +1045,7 @@ def query_sqlite_db(
 		str, group clause (default: "")
 	:param verbose:
 	:param print_table:
+	:param values:
 		see :func:`query_sqlite_db_generic`
 
 	:return:
@@ -661,7 +1054,7 @@ def query_sqlite_db(
 	query = build_sql_query(table_clause, column_clause, join_clause,
 							where_clause, having_clause, order_clause)
 	return query_sqlite_db_generic(db_filespec, query, verbose=verbose,
-									print_table=print_table)
+									print_table=print_table, values=values)
 
 
 